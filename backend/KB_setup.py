@@ -1,22 +1,23 @@
-from datasets import load_dataset
-from langchain.docstore.document import Document
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
-from openai import embeddings
-from qdrant_client.http import models
+from embedding_cache import get_embeddings
+from vdb_updater import load_vector_store, save_vector_store, vector_store_exists, locked, VECTOR_DB_ROOT
 import os
 load_dotenv()
 class KB_setup:
     def __init__(self,vector_db_dir):
         self.vector_db_dir = vector_db_dir
         self.vector_store = None
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+        self.embeddings = get_embeddings()
+    def exists(self):
+        return vector_store_exists(os.path.join(self.vector_db_dir,"vector_store"))
     def load_data(self):
         vector_store_path = os.path.join(self.vector_db_dir,"vector_store")
-        self.vector_store = FAISS.load_local(vector_store_path, self.embeddings,allow_dangerous_deserialization=True)
+        self.vector_store = load_vector_store(vector_store_path, self.embeddings)
         return self.vector_store
     def create_vector_store(self):
+        # Build-time only dependencies; serving just loads the saved FAISS index.
+        from datasets import load_dataset
+        from langchain_community.vectorstores import FAISS
         dataset = load_dataset("gsm8k","main")["train"]
         docs = []
         i = 0
@@ -27,9 +28,10 @@ class KB_setup:
                 break
         self.vector_store = FAISS.from_texts(docs, self.embeddings)
         vector_store_path = os.path.join(self.vector_db_dir,"vector_store")
-        self.vector_store.save_local(vector_store_path)
+        with locked(vector_store_path):
+            save_vector_store(self.vector_store, vector_store_path)
         return "Vector store created and saved to disk."
 
-kb_setup = KB_setup(vector_db_dir="provide the path to your vector db directory")
-kb_setup.create_vector_store()
-Vector_store = kb_setup.load_data()
\ No newline at end of file
+if __name__ == "__main__":
+    kb_setup = KB_setup(vector_db_dir=VECTOR_DB_ROOT)
+    print(kb_setup.create_vector_store())
@@ -1,18 +1,20 @@
 from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
 from langchain.schema import HumanMessage, SystemMessage
-from langchain.memory import ConversationBufferWindowMemory
 from model import Model
-from pylatexenc.latex2text import LatexNodes2Text
 from typing import Optional
+from contextlib import asynccontextmanager
 import asyncio
 import json
-from langchain.tools import tool
+import os
 import re  # <-- add
 
 load_dotenv()
 
+MCP_URL = os.getenv("MCP_URL", "http://127.0.0.1:8001/mcp")
+
 # --------- Add these helpers (HTML and Unicode superscripts) ---------
 _SUP_MAP = {
     '0':'⁰','1':'¹','2':'²','3':'³','4':'⁴','5':'⁵','6':'⁶','7':'⁷','8':'⁸','9':'⁹',
@@ -78,31 +80,72 @@ Solve: x = 1
 Reasoning: answer the question step by step
 Final: x=1
 NEVER give answers without tools. If non-math, respond: "Please ask only mathematical questions." """
+        # Used when the caller already ran retrieval (the batch path): retrieve_data is not bound then.
+        self.context_system_prompt = """You are MathMentor AI. The user's message includes knowledge-base context that was ALREADY retrieved for this question; it replaces the retrieve_data step, so do not ask for retrieval again.
+
+
+MANDATORY SEQUENCE:
+1. Check if the input question is related to the mathematics field or a problem in maths if yes then continue the process if not strictly stop the process and respond with "Please ask only mathematical questions."
+2. Read the supplied knowledge-base context.
+3. If the context is insufficient, call web_search.
+4. Solve step-by-step USING THE CONTEXT AND TOOL RESULTS.
+5. Give final answer with step by step solution and reasoning.
+
+If non-math, respond: "Please ask only mathematical questions." """
 
     def _render_exponents(self, text: str) -> str:
         if self.exponent_render == "html":
             return caret_to_html_sup(text)
         return caret_to_unicode_sup(text)
 
-    async def get_response(self, question: str):
-        self.current_question = question
-        client = MultiServerMCPClient({
+    def _mcp_client(self) -> MultiServerMCPClient:
+        return MultiServerMCPClient({
             "mcp_server": {
-                "url": "http://127.0.0.1:8001/mcp",
+                "url": MCP_URL,
                 "transport": "streamable_http"
             }
         })
-        
+
+    @asynccontextmanager
+    async def mcp_tools(self):
+        """Open one MCP session and yield its tools, so many get_response calls can share it."""
+        async with self._mcp_client().session("mcp_server") as session:
+            yield await load_mcp_tools(session)
+
+    async def retrieve_batch(self, tools, queries: list[str]) -> list[Optional[str]]:
+        """Knowledge-base context for every query in one retrieve_data_batch call (None where unavailable)."""
+        tool = next((t for t in tools if t.name == "retrieve_data_batch"), None)
+        if tool is None or not queries:
+            return [None] * len(queries)
+        try:
+            raw = await tool.ainvoke({"queries": queries})
+            if not isinstance(raw, str):
+                raw = "".join(c.get("text", "") if isinstance(c, dict) else str(c) for c in raw)
+            contexts = json.loads(raw)
+            return contexts if len(contexts) == len(queries) else [None] * len(queries)
+        except Exception as e:
+            print(f"[MathTutorAgent] Batched retrieval failed: {e}")
+            return [None] * len(queries)
+
+    async def get_response(self, question: str, tools=None, context: Optional[str] = None):
+        """`tools` reuses an open MCP session (see mcp_tools); `context` is knowledge-base text
+        already fetched for this question, which stands in for the retrieve_data step."""
+        self.current_question = question
         try:
-            mcp_tools = await client.get_tools()
+            mcp_tools = tools if tools is not None else await self._mcp_client().get_tools()
+            # retrieve_data_batch is for the API's batch path, not for the model to call; with
+            # pre-fetched context, retrieve_data would only repeat that lookup.
+            hidden = {"retrieve_data_batch"} if context is None else {"retrieve_data_batch", "retrieve_data"}
+            mcp_tools = [t for t in mcp_tools if t.name not in hidden]
             llm_with_tools = self.llm.bind_tools(mcp_tools)
             agent = create_react_agent(
                 model=llm_with_tools,
                 tools=mcp_tools,
             )
             messages = [
-                SystemMessage(content=self.system_prompt),
-                HumanMessage(content=question)
+                SystemMessage(content=self.system_prompt if context is None else self.context_system_prompt),
+                HumanMessage(content=question if context is None else
+                             f"{question}\n\nKnowledge-base context (already retrieved for this question):\n{context}")
             ]
 
             print("\nPROCESSING:\n")
@@ -124,6 +167,7 @@ NEVER give answers without tools. If non-math, respond: "Please ask only mathema
             final_message = result["messages"][-1]
             final_content = final_message.content if hasattr(final_message, 'content') else str(final_message)
             # Existing LaTeX -> text pass
+            from pylatexenc.latex2text import LatexNodes2Text
             text = LatexNodes2Text().latex_to_text(final_content)
             # New exponent rendering
             return self._render_exponents(text)
@@ -160,6 +204,7 @@ Just refine the given answer based on the feedback provided."""
             if isinstance(content, list):
                 content = ' '.join([c.get('text','') if isinstance(c, dict) else str(c) for c in content])
             # Existing LaTeX -> text pass
+            from pylatexenc.latex2text import LatexNodes2Text
             text = LatexNodes2Text().latex_to_text(content) or LatexNodes2Text().latex_to_text(str(response))
             # New exponent rendering
             return self._render_exponents(text)
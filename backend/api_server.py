@@ -1,16 +1,24 @@
 import os
 import asyncio
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from agent import MathTutorAgent, feedbackAgent
 from vdb_updater import get_updater
+from embedding_cache import cache_stats
+from scheduler import JobScheduler, QueueFull, DeadlineExpired, PRIORITIES
+from loop_lag import LoopLagMonitor
+from interaction_log import log_interaction
+from warmup import Warmup, FAST_START
 from dotenv import load_dotenv
 
 load_dotenv()
 
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "groq")
 MODEL_NAME = os.getenv("MODEL_NAME", "openai/gpt-oss-120b")
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
 
 app = FastAPI(title="MathTutor API", version="1.0.0")
 
@@ -22,8 +30,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-agent_instance = MathTutorAgent(model_provider=MODEL_PROVIDER, model_name=MODEL_NAME)
-feedback_instance = feedbackAgent(model_provider=MODEL_PROVIDER, model_name=MODEL_NAME)
+def _load_agent():
+    from agent import MathTutorAgent
+    return MathTutorAgent(model_provider=MODEL_PROVIDER, model_name=MODEL_NAME)
+
+def _load_feedback_agent():
+    from agent import feedbackAgent
+    return feedbackAgent(model_provider=MODEL_PROVIDER, model_name=MODEL_NAME)
+
+# agent.py pulls in langgraph, langchain, the MCP adapters and a provider SDK; get_updater loads the
+# embedding model. With FAST_START they load in the background after startup (see /health),
+# otherwise right here at import as before.
+warmup = Warmup()
+warmup.register("agent", _load_agent)
+warmup.register("feedback_agent", _load_feedback_agent)
+warmup.register("embeddings", get_updater)
+if not FAST_START:
+    for name in warmup.components:
+        warmup.get(name)
+scheduler = JobScheduler()
+loop_lag = LoopLagMonitor()
 
 class AskRequest(BaseModel):
     question: str
@@ -32,6 +58,36 @@ class AskResponse(BaseModel):
     answer: str
     error: str | None = None
 
+class JobRequest(BaseModel):
+    question: str
+    priority: str = "interactive"
+    deadline_s: float | None = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    priority: str
+    wait_s: float
+    run_s: float | None = None
+    answer: str | None = None
+    error: str | None = None
+
+class BatchAskRequest(BaseModel):
+    questions: list[str]
+    max_concurrency: int | None = None
+
+class BatchAskItem(BaseModel):
+    index: int
+    question: str
+    answer: str
+    error: str | None = None
+
+class BatchAskSummary(BaseModel):
+    done: bool = True
+    total: int
+    succeeded: int
+    failed: int
+
 class FeedbackRequest(BaseModel):
     question: str
     answer: str
@@ -41,36 +97,153 @@ class FeedbackResponse(BaseModel):
     improved_answer: str
     error: str | None = None
 
+@app.on_event("startup")
+async def start_background_tasks():
+    loop_lag.start()
+    warmup.start()
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    """503 until the agents and embedding model are loaded, so load balancers can hold traffic back."""
+    if warmup.ready:
+        return {"status": "ok", "components": warmup.status()}
+    return JSONResponse(status_code=503, content={"status": "starting", "components": warmup.status()})
+
+@app.get("/metrics")
+async def metrics(lag_since: float | None = None):
+    """Figures are for the worker that answers (see `pid`). `lag_since` (unix time) limits event-loop
+    lag to samples taken after it, e.g. to leave out warm-up stalls when measuring a load test."""
+    return {"pid": os.getpid(), "embedding_cache": cache_stats(), "scheduler": scheduler.metrics(),
+            "event_loop_lag": loop_lag.metrics(since=lag_since)}
+
+def _overloaded(detail: str, retry_after: int) -> JSONResponse:
+    return JSONResponse(status_code=429, content={"detail": detail}, headers={"Retry-After": str(retry_after)})
+
+async def _answer_and_store(question: str) -> str:
+    agent = await warmup.aget("agent")
+    answer = await agent.get_response(question)
+    if not answer.startswith("Error:"):
+        await asyncio.to_thread(log_interaction, "ask", question=question, answer=answer, source="ask")
+    updater = await warmup.aget("embeddings")
+    # FAISS add + save blocks (and may wait on another worker's file lock); keep it off the event loop.
+    success = await asyncio.to_thread(updater.add_qa_pair, question, answer)
+    if not success:
+        print("Failed to store Q/A pair in vector DB")
+    else:
+        print("Stored Q/A pair in vector DB")
+    return answer
 
 @app.post("/ask", response_model=AskResponse)
 async def ask(req: AskRequest):
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="Empty question")
     try:
-        answer = await agent_instance.get_response(req.question)
-        updater = get_updater()
-        success = updater.add_qa_pair(req.question, answer)
-        if not success:
-            print("Failed to store Q/A pair in vector DB")
-        else:
-            print("Stored Q/A pair in vector DB")
+        answer = await scheduler.run(lambda: _answer_and_store(req.question), priority="interactive")
         return AskResponse(answer=answer)
+    except QueueFull as e:
+        return _overloaded(str(e), e.retry_after)
+    except DeadlineExpired as e:
+        return _overloaded(str(e), scheduler.retry_after())
     except Exception as e:
         return AskResponse(answer="", error=str(e))
 
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def submit_job(req: JobRequest):
+    """Async mode: returns a job ID immediately; poll GET /jobs/{job_id} for the answer."""
+    if not req.question.strip():
+        raise HTTPException(status_code=400, detail="Empty question")
+    if req.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of {sorted(PRIORITIES)}")
+    try:
+        job = scheduler.submit(lambda: _answer_and_store(req.question), priority=req.priority, deadline_s=req.deadline_s,
+                               persist=True)
+    except QueueFull as e:
+        return _overloaded(str(e), e.retry_after)
+    return _job_response(job.summary())
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    summary = scheduler.lookup(job_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job ID")
+    return _job_response(summary)
+
+def _job_response(summary: dict) -> JobResponse:
+    return JobResponse(answer=summary.pop("result"), **summary)
+
+@app.post("/ask/batch")
+async def ask_batch(req: BatchAskRequest):
+    """Answer many questions over one MCP session with one batched retrieval.
+    Streams NDJSON: a BatchAskItem per question in completion order, then a BatchAskSummary."""
+    if not req.questions:
+        raise HTTPException(status_code=400, detail="No questions")
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+    questions = [q.strip() for q in req.questions]
+    limit = max(1, min(req.max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+
+    async def run_one(agent, index: int, question: str, tools, context, semaphore) -> BatchAskItem:
+        if not question:
+            return BatchAskItem(index=index, question=question, answer="", error="Empty question")
+        async with semaphore:
+            try:
+                answer = await scheduler.run(lambda: agent.get_response(question, tools=tools, context=context), priority="batch")
+            except Exception as e:
+                return BatchAskItem(index=index, question=question, answer="", error=str(e))
+        if answer.startswith("Error:"):
+            return BatchAskItem(index=index, question=question, answer="", error=answer)
+        await asyncio.to_thread(log_interaction, "ask", question=question, answer=answer, source="batch")
+        return BatchAskItem(index=index, question=question, answer=answer)
+
+    async def stream():
+        results: list[BatchAskItem] = []
+        tasks = []
+        try:
+            agent = await warmup.aget("agent")
+            async with agent.mcp_tools() as tools:
+                contexts = await agent.retrieve_batch(tools, [q or " " for q in questions])
+                semaphore = asyncio.Semaphore(limit)
+                tasks = [asyncio.create_task(run_one(agent, i, q, tools, contexts[i], semaphore)) for i, q in enumerate(questions)]
+                for fut in asyncio.as_completed(tasks):
+                    item = await fut
+                    results.append(item)
+                    yield item.model_dump_json() + "\n"
+        except Exception as e:
+            # Session-level failure: report every question that has not finished yet.
+            done = {r.index for r in results}
+            for i, q in enumerate(questions):
+                if i not in done:
+                    item = BatchAskItem(index=i, question=q, answer="", error=f"Batch failed: {e}")
+                    results.append(item)
+                    yield item.model_dump_json() + "\n"
+        finally:
+            for t in tasks:
+                t.cancel()
+        pairs = [(r.question, r.answer) for r in results if r.error is None]
+        if pairs:
+            updater = await warmup.aget("embeddings")
+            success = await asyncio.to_thread(updater.add_qa_pairs, pairs)
+            print(f"Stored {len(pairs)} Q/A pairs in vector DB" if success else "Failed to store batch Q/A pairs in vector DB")
+        failed = sum(1 for r in results if r.error is not None)
+        yield BatchAskSummary(total=len(questions), succeeded=len(results) - failed, failed=failed).model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
 @app.post("/feedback", response_model=FeedbackResponse)
 async def feedback(req: FeedbackRequest):
     if not (req.question.strip() and req.answer.strip() and req.feedback.strip()):
         raise HTTPException(status_code=400, detail="question, answer and feedback required")
     try:
-        improved = feedback_instance.get_feedback_answer(req.question, req.answer, req.feedback)
+        feedback_agent = await warmup.aget("feedback_agent")
+        improved = feedback_agent.get_feedback_answer(req.question, req.answer, req.feedback)
+        if not improved.startswith("Error:"):
+            await asyncio.to_thread(log_interaction, "feedback", question=req.question, answer=req.answer,
+                                    feedback=req.feedback, improved_answer=improved)
         return FeedbackResponse(improved_answer=improved)
     except Exception as e:
         return FeedbackResponse(improved_answer="", error=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8010, reload=False)
+    # Workers share the vector store safely via vdb_updater's file lock + atomic saves.
+    uvicorn.run("api_server:app" if API_WORKERS > 1 else app, host="0.0.0.0", port=8010, reload=False, workers=API_WORKERS)
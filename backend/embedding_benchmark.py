@@ -0,0 +1,104 @@
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import argparse
+import subprocess
+import numpy as np
+
+
+def load_corpus(n_docs: int, n_queries: int):
+    from datasets import load_dataset
+    ds = load_dataset("gsm8k", "main")
+    docs = [f"Q: {item['question']}\nA: {item['answer']}" for item in ds["train"].select(range(n_docs))]
+    queries = [item["question"] for item in ds["test"].select(range(n_queries))]
+    return docs, queries
+
+
+def worker(backend: str, corpus_path: str, out_path: str):
+    """Runs in a fresh interpreter so import/startup time and peak RSS belong to one backend only.
+    The corpus comes in as plain JSON, so the datasets/pyarrow stack never loads here."""
+    with open(corpus_path, "r", encoding="utf-8") as f:
+        corpus = json.load(f)
+    docs, queries = corpus["docs"], corpus["queries"]
+    t0 = time.perf_counter()
+    from embedding_cache import create_base_embeddings
+    emb = create_base_embeddings(backend=backend)
+    emb.embed_query("warmup")
+    startup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    doc_vecs = np.asarray(emb.embed_documents(docs), dtype=np.float32)
+    doc_time = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    query_vecs = np.asarray([emb.embed_query(q) for q in queries], dtype=np.float32)
+    query_time = time.perf_counter() - t0
+
+    np.savez(out_path, docs=doc_vecs, queries=query_vecs)
+    print(json.dumps({
+        "backend": backend,
+        "startup_s": startup,
+        "docs_per_s": len(docs) / doc_time,
+        "query_ms": 1000 * query_time / max(len(queries), 1),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+
+def top_k(docs: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    docs = docs / np.linalg.norm(docs, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-queries @ docs.T, axis=1)[:, :k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends: startup, throughput, memory and recall parity")
+    parser.add_argument('--backends', nargs='+', default=["torch", "onnx"])
+    parser.add_argument('--docs', type=int, default=500, help='GSM8K train items to embed (same as KB_setup)')
+    parser.add_argument('--queries', type=int, default=100, help='GSM8K test questions used as retrieval queries')
+    parser.add_argument('--k', type=int, default=3, help='k used by retrieve_data')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    parser.add_argument('--corpus', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.corpus, args.out)
+        return
+
+    docs, queries = load_corpus(args.docs, args.queries)
+    corpus_path = os.path.join(tempfile.gettempdir(), "embedding_benchmark_corpus.json")
+    with open(corpus_path, "w", encoding="utf-8") as f:
+        json.dump({"docs": docs, "queries": queries}, f)
+
+    results, vectors = [], {}
+    for backend in args.backends:
+        out = os.path.join(tempfile.gettempdir(), f"embedding_benchmark_{backend}.npz")
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", backend, "--out", out, "--corpus", corpus_path],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            print(f"[{backend}] failed:\n{proc.stderr}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        vectors[backend] = np.load(out)
+
+    reference = args.backends[0]
+    for r in results:
+        if r["backend"] != reference and reference in vectors:
+            ref = top_k(vectors[reference]["docs"], vectors[reference]["queries"], args.k)
+            got = top_k(vectors[r["backend"]]["docs"], vectors[r["backend"]]["queries"], args.k)
+            overlap = [len(set(a) & set(b)) / args.k for a, b in zip(ref, got)]
+            r[f"recall@{args.k}_vs_{reference}"] = float(np.mean(overlap))
+
+    print(f"\n{'backend':<8} {'startup s':>10} {'docs/s':>10} {'query ms':>10} {'peak MB':>10}  recall")
+    for r in results:
+        recall = r.get(f"recall@{args.k}_vs_{reference}", "-")
+        recall = f"{recall:.3f}" if isinstance(recall, float) else recall
+        print(f"{r['backend']:<8} {r['startup_s']:>10.2f} {r['docs_per_s']:>10.1f} {r['query_ms']:>10.2f} {r['peak_rss_mb']:>10.0f}  {recall}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from file_lock import file_lock
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mathmentor", "embeddings"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+
+
+def content_key(model_name: str, kind: str, text: str) -> str:
+    """Hash of (model, kind, text). `kind` keeps query and document embeddings apart,
+    since some backends embed them differently."""
+    h = hashlib.sha256()
+    for part in (model_name, kind, text):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class DiskEmbeddingStore:
+    """Append-only on-disk store shared by every process using the same model.
+
+    Layout of `<root>/<model>/`:
+      meta.json    - {"model", "dim", "dtype"}
+      vectors.f32  - float32 rows, read through np.memmap
+      index.tsv    - "<key>\\t<row>" lines, appended after the row is written
+    Writers serialise on a flock; readers never lock and only see rows whose index line is complete.
+    """
+    def __init__(self, root: str, model_name: str):
+        self.model_name = model_name
+        self.dir = os.path.join(root, re.sub(r"[^A-Za-z0-9._-]+", "__", model_name))
+        os.makedirs(self.dir, exist_ok=True)
+        self.meta_path = os.path.join(self.dir, "meta.json")
+        self.vectors_path = os.path.join(self.dir, "vectors.f32")
+        self.index_path = os.path.join(self.dir, "index.tsv")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self.dim: Optional[int] = None
+        self._index: dict[str, int] = {}
+        self._index_offset = 0
+        self._mmap: Optional[np.memmap] = None
+        self._load_meta()
+
+    def _load_meta(self):
+        if self.dim is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = int(json.load(f)["dim"])
+
+    def _refresh_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_offset)
+            chunk = f.read()
+        # Ignore a trailing partial line; it is picked up on the next refresh.
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            key, _, row = line.decode("ascii").partition("\t")
+            if row:
+                self._index[key] = int(row)
+        self._index_offset += end
+
+    def _rows(self, rows: list[int]) -> np.ndarray:
+        needed = max(rows) + 1
+        if self._mmap is None or self._mmap.shape[0] < needed:
+            count = os.path.getsize(self.vectors_path) // (4 * self.dim)
+            self._mmap = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        return np.asarray(self._mmap[rows])
+
+    def __len__(self) -> int:
+        self._refresh_index()
+        return len(self._index)
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        if any(k not in self._index for k in keys):
+            self._refresh_index()
+            self._load_meta()
+        found = [(k, self._index[k]) for k in keys if k in self._index]
+        if not found:
+            return {}
+        vectors = self._rows([row for _, row in found])
+        return {k: vec.tolist() for (k, _), vec in zip(found, vectors)}
+
+    def put_many(self, items: dict[str, list[float]]):
+        if not items:
+            return
+        dim = len(next(iter(items.values())))
+        with file_lock(self.lock_path):
+            self._load_meta()
+            if self.dim is None:
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model_name, "dim": dim, "dtype": "float32"}, f)
+                self.dim = dim
+            elif self.dim != dim:
+                raise ValueError(f"Embedding dim {dim} does not match cache dim {self.dim} for {self.model_name}")
+            self._refresh_index()
+            new = {k: v for k, v in items.items() if k not in self._index}
+            if not new:
+                return
+            start = os.path.getsize(self.vectors_path) // (4 * dim) if os.path.exists(self.vectors_path) else 0
+            if os.path.exists(self.vectors_path):
+                # Drop a partial row left by an interrupted write, or every row after it would be misaligned.
+                os.truncate(self.vectors_path, start * 4 * dim)
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.asarray(list(new.values()), dtype=np.float32).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, "a", encoding="ascii") as f:
+                f.write("".join(f"{k}\t{start + i}\n" for i, k in enumerate(new)))
+            self._refresh_index()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with an in-memory LRU in front of a DiskEmbeddingStore."""
+    def __init__(self, base: Embeddings, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.base = base
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.store = DiskEmbeddingStore(cache_dir, model_name)
+        self._lru: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _lookup(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        with self._lock:
+            for k in keys:
+                if k in self._lru:
+                    self._lru.move_to_end(k)
+                    found[k] = self._lru[k]
+            self.memory_hits += len(found)
+            missing = [k for k in keys if k not in found]
+            if missing:
+                try:
+                    from_disk = self.store.get_many(missing)
+                except Exception as e:
+                    print(f"[EmbeddingCache] Disk lookup failed: {e}")
+                    from_disk = {}
+                self.disk_hits += len(from_disk)
+                self.misses += len(missing) - len(from_disk)
+                self._remember(from_disk)
+                found.update(from_disk)
+        return found
+
+    def _remember(self, items: dict[str, list[float]]):
+        for k, v in items.items():
+            self._lru[k] = v
+            self._lru.move_to_end(k)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _store(self, items: dict[str, list[float]]):
+        with self._lock:
+            self._remember(items)
+            try:
+                self.store.put_many(items)
+            except Exception as e:
+                print(f"[EmbeddingCache] Failed to persist embeddings: {e}")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [content_key(self.model_name, "doc", t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        pending = {k: t for k, t in zip(keys, texts) if k not in found}
+        if pending:
+            vectors = self.base.embed_documents(list(pending.values()))
+            computed = dict(zip(pending.keys(), vectors))
+            self._store(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        key = content_key(self.model_name, "query", text)
+        found = self._lookup([key])
+        if key in found:
+            return found[key]
+        vector = self.base.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Batched embed_query sharing its cache keys. Misses go through one base.embed_documents
+        call, which is equivalent for the symmetric models served here (no query instruction)."""
+        keys = [content_key(self.model_name, "query", t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        pending = {k: t for k, t in zip(keys, texts) if k not in found}
+        if pending:
+            computed = dict(zip(pending.keys(), self.base.embed_documents(list(pending.values()))))
+            self._store(computed)
+            found.update(computed)
+        return [found[k] for k in keys]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model": self.model_name,
+                "lookups": lookups,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "disk_entries": len(self.store._index),
+            }
+
+
+_instances: dict[str, CachedEmbeddings] = {}
+_instances_lock = threading.Lock()
+
+
+def create_base_embeddings(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    if backend == "torch":
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=model_name)
+    elif backend == "onnx":
+        from onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(model_name=model_name)
+    else:
+        raise ValueError(f"Unsupported embedding backend: {backend}")
+
+
+def get_embeddings(model_name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND) -> CachedEmbeddings:
+    """Process-wide cached embeddings for `model_name`; KB_setup, mcp_server and vdb_updater all go through here.
+    Non-torch backends get their own cache namespace since their vectors are not bit-identical."""
+    cache_name = model_name if backend == "torch" else f"{model_name}@{backend}"
+    with _instances_lock:
+        if cache_name not in _instances:
+            _instances[cache_name] = CachedEmbeddings(create_base_embeddings(model_name, backend), cache_name)
+        return _instances[cache_name]
+
+
+def cache_stats() -> list[dict]:
+    return [emb.stats() for emb in _instances.values()]
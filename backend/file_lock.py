@@ -0,0 +1,19 @@
+import os
+import fcntl
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str, shared: bool = False):
+    """Hold an advisory flock on `path` (created if missing) for the duration of the block.
+    Works across processes, unlike threading.Lock."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,35 @@
+import os
+import json
+import time
+from typing import Iterator
+from file_lock import file_lock
+
+INTERACTION_LOG_DIR = os.getenv("INTERACTION_LOG_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs"))
+
+
+def log_interaction(kind: str, log_dir: str = INTERACTION_LOG_DIR, **fields):
+    """Append one JSON line to `<log_dir>/<kind>.jsonl` ("ask" or "feedback").
+    Locked so lines from several API workers never interleave."""
+    path = os.path.join(log_dir, f"{kind}.jsonl")
+    line = json.dumps({"ts": time.time(), **fields}, ensure_ascii=False) + "\n"
+    try:
+        with file_lock(path + ".lock"):
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+    except OSError as e:
+        print(f"[interaction_log] Failed to log {kind}: {e}")
+
+
+def read_interactions(kind: str, log_dir: str = INTERACTION_LOG_DIR) -> Iterator[dict]:
+    path = os.path.join(log_dir, f"{kind}.jsonl")
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
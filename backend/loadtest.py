@@ -0,0 +1,213 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+import httpx
+from loop_lag import LoopLagMonitor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+QUESTIONS = [
+    "Solve x^2 = 4 for positive x.",
+    "What is the derivative of x^3?",
+    "A train travels 120 km in 2 hours. What is its average speed?",
+    "Factor x^2 - 5x + 6.",
+]
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+# Runs with the load test's env so the index lands in its VECTOR_DB_ROOT, built with the same embeddings the API loads.
+SEED_INDEX = """
+import os, sys
+from langchain_community.vectorstores import FAISS
+from embedding_cache import get_embeddings
+from vdb_updater import save_vector_store, locked, VECTOR_DB_ROOT
+path = os.path.join(VECTOR_DB_ROOT, "vector_store")
+with locked(path):
+    save_vector_store(FAISS.from_texts(sys.argv[1:], get_embeddings()), path)
+"""
+
+
+def start_stack(args, state_dir: str) -> list[subprocess.Popen]:
+    """Stub LLM + stub MCP + api_server wired to them. The API's vector store, logs and embedding
+    cache live under `state_dir`, seeded with a small index, so a run never touches the real ones."""
+    procs = [
+        subprocess.Popen([sys.executable, "stub_servers.py", "llm", "--port", str(args.llm_port),
+                          "--latency-ms", str(args.llm_latency_ms), "--jitter-ms", str(args.llm_jitter_ms),
+                          "--tools", args.script], cwd=HERE),
+        subprocess.Popen([sys.executable, "stub_servers.py", "mcp", "--port", str(args.mcp_port),
+                          "--latency-ms", str(args.mcp_latency_ms)], cwd=HERE),
+    ]
+    env = dict(os.environ,
+               MODEL_PROVIDER="openai", MODEL_NAME="stub",
+               OPENAI_API_KEY="stub",
+               OPENAI_API_BASE=f"http://127.0.0.1:{args.llm_port}/v1",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{args.llm_port}/v1",
+               MCP_URL=f"http://127.0.0.1:{args.mcp_port}/mcp",
+               VECTOR_DB_ROOT=os.path.join(state_dir, "vector_db"),
+               INTERACTION_LOG_DIR=os.path.join(state_dir, "logs"),
+               JOB_STATE_DIR=os.path.join(state_dir, "jobs"),
+               EMBEDDING_CACHE_DIR=os.path.join(state_dir, "embeddings"))
+    os.makedirs(env["INTERACTION_LOG_DIR"], exist_ok=True)
+    subprocess.run([sys.executable, "-c", SEED_INDEX, *(f"Q: {q}\nA: stub" for q in QUESTIONS)],
+                   cwd=HERE, env=env, check=True)
+    procs.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1",
+                                   "--port", str(args.api_port), "--workers", str(args.workers),
+                                   "--log-level", "warning"], cwd=HERE, env=env))
+    return procs
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+async def worker_metrics(target: str, since: float, workers: int) -> dict[int, dict]:
+    """/metrics from as many API workers as answer, keyed by pid. Each fetch uses a new connection so
+    the kernel can hand it to a different worker; with one worker this is a single request."""
+    seen: dict[int, dict] = {}
+    for _ in range(1 if workers <= 1 else 10 * workers):
+        async with httpx.AsyncClient(timeout=10) as client:
+            m = (await client.get(f"{target}/metrics", params={"lag_since": since})).json()
+        seen[m.get("pid", 0)] = m
+        if len(seen) >= workers:
+            break
+    return seen
+
+
+async def drive(args, target: str) -> dict:
+    latencies: list[float] = []
+    statuses: Counter = Counter()
+    client_lag = LoopLagMonitor(interval=0.05)
+    counter = iter(range(args.requests))
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        await wait_ready(client, f"{target}/health")
+        stats_url = f"http://127.0.0.1:{args.llm_port}/stats"
+        if not args.target:
+            await wait_ready(client, stats_url)
+        llm_before = (await client.get(stats_url)).json() if not args.target else {}
+
+        async def user():
+            for i in counter:
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post(f"{target}/ask", json={"question": QUESTIONS[i % len(QUESTIONS)]})
+                    # /ask reports scheduler failures as 200 with an `error` field, and agent
+                    # failures as 200 with an "Error: ..." answer.
+                    status = resp.status_code
+                    if status == 200:
+                        body = resp.json()
+                        if body.get("error") or (body.get("answer") or "").startswith("Error:"):
+                            status = "200-error"
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(time.perf_counter() - t0)
+
+        client_lag.start()
+        # Server lag is only counted from here on, so startup/warm-up stalls don't show up as load lag.
+        load_start = time.time()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - t0
+
+        server_metrics = await worker_metrics(target, load_start, args.workers)
+        llm_after = (await client.get(stats_url)).json() if not args.target else {}
+
+    latencies.sort()
+    report = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "elapsed_s": elapsed,
+        "ok": len(latencies),
+        "statuses": {str(k): v for k, v in statuses.items()},
+        "requests_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "latency_s": {f"p{p}": percentile(latencies, p) for p in (50, 95, 99)} | {"max": latencies[-1] if latencies else 0.0},
+        "client_loop_lag": client_lag.metrics(),
+        "server_workers": args.workers,
+        # Per API worker that answered /metrics (by pid); may be fewer than server_workers.
+        "server": {str(pid): {"event_loop_lag": m.get("event_loop_lag"), "scheduler": m.get("scheduler")}
+                   for pid, m in server_metrics.items()},
+    }
+    if llm_after:
+        calls = llm_after.get("requests", 0) - llm_before.get("requests", 0)
+        report["llm_calls"] = calls
+        report["llm_calls_per_request"] = calls / args.requests
+    return report
+
+
+def print_report(r: dict):
+    lat = r["latency_s"]
+    print(f"\n📈 {r['ok']}/{r['requests']} ok at concurrency {r['concurrency']} in {r['elapsed_s']:.1f}s -> {r['requests_per_s']:.2f} req/s")
+    print(f"   latency p50 {lat['p50']:.2f}s | p95 {lat['p95']:.2f}s | p99 {lat['p99']:.2f}s | max {lat['max']:.2f}s")
+    print(f"   statuses: {r['statuses']}")
+    print(f"   server metrics from {len(r['server'])} of {r['server_workers']} API worker(s):")
+    for pid, w in r["server"].items():
+        sl = w.get("event_loop_lag")
+        if sl:
+            print(f"     pid {pid}: event-loop lag avg {sl['avg_ms']:.1f}ms | p99 {sl['p99_ms']:.1f}ms | max {sl['max_ms']:.1f}ms")
+    cl = r["client_loop_lag"]
+    print(f"   client event-loop lag p99 {cl['p99_ms']:.1f}ms (high values mean the driver itself is the bottleneck)")
+    if "llm_calls_per_request" in r:
+        print(f"   LLM calls per request: {r['llm_calls_per_request']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /ask against stub LLM and MCP servers")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--target', help='Use an already running API (e.g. http://127.0.0.1:8010) instead of starting the stub stack')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers for the spawned api_server (with --target: workers to collect /metrics from)')
+    parser.add_argument('--api-port', type=int, default=9100)
+    parser.add_argument('--llm-port', type=int, default=9101)
+    parser.add_argument('--mcp-port', type=int, default=9102)
+    parser.add_argument('--llm-latency-ms', type=float, default=800)
+    parser.add_argument('--llm-jitter-ms', type=float, default=200)
+    parser.add_argument('--mcp-latency-ms', type=float, default=20)
+    parser.add_argument('--script', default="retrieve_data", help='Tool calls the stub LLM makes before answering')
+    parser.add_argument('--json', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    state_dir = tempfile.TemporaryDirectory(prefix="mathmentor-loadtest-")
+    procs = []
+    target = args.target or f"http://127.0.0.1:{args.api_port}"
+    try:
+        if not args.target:
+            procs = start_stack(args, state_dir.name)
+        report = asyncio.run(drive(args, target))
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=10)
+        state_dir.cleanup()
+    if not args.target and not report.get("llm_calls"):
+        # Every request failed before reaching the model (e.g. the API isn't using the stub), so latencies mean nothing.
+        sys.exit(f"Stub LLM received no requests; statuses: {report['statuses']}")
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag: how late a periodic `asyncio.sleep(interval)` wakes up.
+    Anything blocking the loop (sync I/O, CPU-heavy code) shows up here. Samples are wall-clock stamped
+    so `metrics(since=...)` can leave out earlier stalls, e.g. the warm-up imports at startup."""
+    def __init__(self, interval: float = 0.1, window: int = 3000):
+        self.interval = interval
+        self._samples: deque[tuple[float, float]] = deque(maxlen=window)  # (time.time(), lag)
+        self._max = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            t0 = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - t0 - self.interval)
+            self._samples.append((time.time(), lag))
+            self._max = max(self._max, lag)
+
+    def reset(self):
+        self._samples.clear()
+        self._max = 0.0
+
+    def metrics(self, since: Optional[float] = None) -> dict:
+        """Lag over the window, or only over samples taken after `since` (a time.time() value)."""
+        samples = sorted(lag for ts, lag in self._samples if since is None or ts >= since)
+        if not samples:
+            return {"samples": 0, "avg_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "samples": len(samples),
+            "avg_ms": 1000 * sum(samples) / len(samples),
+            "p99_ms": 1000 * samples[int(0.99 * (len(samples) - 1))],
+            "max_ms": 1000 * (self._max if since is None else samples[-1]),
+        }
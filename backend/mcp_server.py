@@ -1,16 +1,40 @@
 from fastmcp import FastMCP
-from langchain_tavily import TavilySearch
 from typing import Optional
 import os
-from KB_setup import KB_setup,Vector_store
+import json
+from KB_setup import KB_setup
+from vdb_updater import VECTOR_DB_ROOT
+from embedding_cache import cache_stats
+from warmup import Warmup, FAST_START
+from starlette.requests import Request
+from starlette.responses import JSONResponse
 from dotenv import load_dotenv
 load_dotenv()
 mcp = FastMCP("Server")
 
+def _load_vector_store():
+    kb = KB_setup(vector_db_dir=VECTOR_DB_ROOT)
+    if not kb.exists():
+        print(kb.create_vector_store())
+    return kb.load_data()
+
+warmup = Warmup()
+warmup.register("vector_store", _load_vector_store)
+
 @mcp.tool
 def retrieve_data(query: str) -> str:
     """Retrieve relevant data from the knowledge base."""
-    results = Vector_store.similarity_search(query, k=3)
+    results = warmup.get("vector_store").similarity_search(query, k=3)
+    return _format_results(results)
+
+@mcp.tool
+def retrieve_data_batch(queries: list[str]) -> str:
+    """Retrieve knowledge-base data for several queries at once. Returns a JSON list with one text per query."""
+    vector_store = warmup.get("vector_store")
+    vectors = vector_store.embeddings.embed_queries(queries)
+    return json.dumps([_format_results(vector_store.similarity_search_by_vector(v, k=3)) for v in vectors])
+
+def _format_results(results) -> str:
     if not results:
         return "No documents found for your query."
     text = ""
@@ -21,11 +45,24 @@ def retrieve_data(query: str) -> str:
 @mcp.tool
 def web_search(query:str)->str:
     """Perform a web search to gather information."""
+    from langchain_tavily import TavilySearch
     tavily_search = TavilySearch(max_results=3,include_raw_content=True,search_depth="advanced",topic="general")
     results = tavily_search.invoke({"query":query})
     return "\n".join([result['content'] for result in results['results']])
 
+@mcp.custom_route("/health", methods=["GET"])
+async def health(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok" if warmup.ready else "starting", "components": warmup.status()},
+                        status_code=200 if warmup.ready else 503)
 
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request: Request) -> JSONResponse:
+    return JSONResponse({"embedding_cache": cache_stats()})
 
 if __name__ == "__main__":
+    # Fast start: serve immediately and load the index + embedding model in the background.
+    if FAST_START:
+        warmup.start()
+    else:
+        warmup.get("vector_store")
     mcp.run(transport="http", host="127.0.0.1", port=8001, path="/mcp")
@@ -1,5 +1,3 @@
-from langchain_groq import ChatGroq
-from langchain_community.chat_models import ChatOpenAI
 from dotenv import load_dotenv
 import os
 load_dotenv()
@@ -8,9 +6,12 @@ class Model:
         self.model_provider = model_provider
         self.model_name = model_name
     def create_model(self):
+        # Provider SDKs are imported here so only the one in use gets loaded.
         if self.model_provider == "groq":
+            from langchain_groq import ChatGroq
             return ChatGroq(model=self.model_name)
         elif self.model_provider == "openai":
-            return ChatOpenAI(model_name=self.model_name)
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model=self.model_name)
         else:
             raise ValueError(f"Unsupported model provider: {self.model_provider}")
\ No newline at end of file
@@ -0,0 +1,100 @@
+import os
+import json
+import argparse
+from typing import Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", os.path.join(os.path.expanduser("~"), ".cache", "mathmentor", "onnx", "all-MiniLM-L6-v2-int8"))
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+MODEL_FILE = "model_int8.onnx"
+SOURCE_FILE = "source.json"  # {"model": <name it was exported from>}
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def export_quantized(model_name: str, out_dir: str) -> str:
+    """One-off export of a sentence-transformer to ONNX with dynamic int8 weights.
+    Needs torch + optimum; serving only needs onnxruntime + tokenizers."""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    from transformers import AutoTokenizer
+
+    fp32_dir = os.path.join(out_dir, "fp32")
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(fp32_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(out_dir)
+    out_path = os.path.join(out_dir, MODEL_FILE)
+    quantize_dynamic(os.path.join(fp32_dir, "model.onnx"), out_path, weight_type=QuantType.QInt8)
+    with open(os.path.join(out_dir, SOURCE_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model": model_name}, f)
+    return out_path
+
+
+def exported_model(model_dir: str) -> str:
+    """Name of the model `model_dir` was exported from. Exports that predate source.json are assumed
+    to be the default MiniLM, the only model the export CLI produced by default."""
+    path = os.path.join(model_dir, SOURCE_FILE)
+    if not os.path.exists(path):
+        return DEFAULT_MODEL
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["model"]
+
+
+class OnnxEmbeddings(Embeddings):
+    """MiniLM embeddings on onnxruntime: mean pooling over the attention mask followed by
+    L2 normalisation, matching the sentence-transformers pipeline of all-MiniLM-L6-v2. When `model_name`
+    is given it must be the model `model_dir` was exported from, so vectors never land under another
+    model's cache namespace."""
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, max_length: int = 256, batch_size: int = 32, threads: int = ONNX_THREADS,
+                 model_name: Optional[str] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise RuntimeError(f"ONNX model not found: {model_path} (run `python backend/onnx_embeddings.py --out {model_dir}`)")
+        if model_name is not None and exported_model(model_dir) != model_name:
+            raise RuntimeError(f"{model_dir} holds an export of {exported_model(model_dir)}, not {model_name} "
+                               f"(run `python backend/onnx_embeddings.py --model {model_name} --out <dir>` and set ONNX_MODEL_DIR)")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(None, feeds)[0]
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        out = []
+        for i in range(0, len(texts), self.batch_size):
+            out.extend(self._embed(texts[i:i + self.batch_size]).tolist())
+        return out
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed([text])[0].tolist()
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX")
+    parser.add_argument('--model', default=DEFAULT_MODEL)
+    parser.add_argument('--out', default=ONNX_MODEL_DIR)
+    args = parser.parse_args(argv)
+    print(f"Exported {args.model} -> {export_quantized(args.model, args.out)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,98 +1,294 @@
-import dspy
+import os
+import re
+import json
+import random
+import hashlib
 import asyncio
-from dspy.teleprompt import BootstrapFewShot
-from agent import MathTutorAgent
+import argparse
+import threading
 from typing import Optional
+import dspy
+from agent import MathTutorAgent, feedbackAgent
+from interaction_log import read_interactions, INTERACTION_LOG_DIR
+
+
+class AsyncBridge:
+    """Runs coroutines on a dedicated event-loop thread, so sync DSPy code can block on the async
+    agent even when called from inside another running loop. At most `max_concurrency` run at once."""
+    def __init__(self, max_concurrency: int = 4):
+        self.max_concurrency = max_concurrency
+        self.loop = asyncio.new_event_loop()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+
+    async def _bounded(self, coro):
+        if self._semaphore is None:
+            # Created lazily so it belongs to the bridge loop.
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._semaphore:
+            return await coro
+
+    def run(self, coro):
+        """Blocking call from any thread except the bridge's own."""
+        return asyncio.run_coroutine_threadsafe(self._bounded(coro), self.loop).result()
+
+    async def arun(self, coro):
+        """Await from another event loop without blocking it."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._bounded(coro), self.loop))
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
 
-def run_async(coro):
-    try:
-        loop = asyncio.get_running_loop()
-    except RuntimeError:
-        loop = None
-    if loop and loop.is_running():
-        return asyncio.ensure_future(coro)
-    return asyncio.run(coro)
 
 class MathTutorModule(dspy.Module):
-    """Wraps MathTutorAgent for DSPy. Provides both async and sync forward."""
-    def __init__(self, math_agent: MathTutorAgent):
+    """Wraps MathTutorAgent for DSPy. `demos` are worked examples shown ahead of the question;
+    they are what the optimizer tunes."""
+    def __init__(self, math_agent: MathTutorAgent, bridge: AsyncBridge, demos: Optional[list] = None):
         super().__init__()
         self.math_agent = math_agent
+        self.bridge = bridge
+        self.demos = list(demos or [])
+
+    def with_demos(self, demos: list) -> "MathTutorModule":
+        return MathTutorModule(self.math_agent, self.bridge, demos)
+
+    def _prompt(self, question: str) -> str:
+        if not self.demos:
+            return question
+        shots = "\n\n".join(f"Question: {d.question}\nAnswer: {d.answer}" for d in self.demos)
+        return f"Worked examples of the expected answer style:\n\n{shots}\n\nNow answer this question:\n{question}"
 
     async def a_forward(self, question: str):
         try:
-            response = await self.math_agent.get_response(question)
+            response = await self.math_agent.get_response(self._prompt(question))
             return dspy.Prediction(answer=response)
         except Exception as e:
             return dspy.Prediction(answer=f"Error: {e}")
+
     def forward(self, question: str):
-        result = run_async(self.a_forward(question))
-        if asyncio.isfuture(result):
-            try:
-                if result.done():
-                    return result.result()
-            except Exception as e:
-                return dspy.Prediction(answer=f"Error: {e}")
-            return dspy.Prediction(answer="(Pending async execution – please await)")
-        return result
+        return self.bridge.run(self.a_forward(question))
+
+
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+
+def simple_metric(example, pred, trace=None):
+    if pred is None:
+        return 0.0
+    ans = getattr(pred, 'answer', '')
+    return 1.0 if isinstance(ans, str) and ans.strip() and not ans.startswith("Error:") else 0.0
+
+
+def answer_metric(example, pred, trace=None):
+    """simple_metric, plus the last number in the answer must match the reference answer's when it has one."""
+    if not simple_metric(example, pred, trace):
+        return 0.0
+    gold = _NUMBER.findall(str(example.answer).replace(",", ""))
+    if not gold:
+        return 1.0
+    got = _NUMBER.findall(pred.answer.replace(",", ""))
+    return 1.0 if got and float(got[-1]) == float(gold[-1]) else 0.0
+
+
+def load_examples(log_dir: str = INTERACTION_LOG_DIR) -> list[dspy.Example]:
+    """Q/A pairs logged by /ask; when /feedback produced an improved answer for the same question, it wins."""
+    by_question: dict[str, dict] = {}
+    for r in read_interactions("ask", log_dir):
+        by_question[r["question"].strip()] = {"answer": r["answer"], "feedback": ""}
+    for r in read_interactions("feedback", log_dir):
+        by_question[r["question"].strip()] = {"answer": r["improved_answer"], "feedback": r["feedback"]}
+    return [dspy.Example(question=q, **v).with_inputs("question")
+            for q, v in by_question.items() if q and v["answer"].strip()]
+
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class OfflineOptimizer:
+    """Random search over few-shot demo sets, scored on a held-out dev split.
+
+    Every (candidate, metric, dev example) score is appended to `<out_dir>/evals.jsonl` as it finishes, so an
+    interrupted run resumes where it stopped. Runs that failed with an "Error: ..." answer (rate limits,
+    timeouts) score 0 for this run but are not checkpointed, so the next run retries them. The winner goes
+    to `<out_dir>/program.json` together with a fingerprint of the data, model and settings; a later run
+    with the same fingerprint reuses it without evaluating anything, unless some evaluations had failed.
+    """
+    def __init__(self, module: MathTutorModule, out_dir: str, metric=answer_metric,
+                 num_candidates: int = 8, max_demos: int = 4, dev_size: int = 20, seed: int = 0):
+        self.module = module
+        self.out_dir = out_dir
+        self.metric = metric
+        self.metric_name = getattr(metric, "__name__", repr(metric))
+        self.model_id = f"{module.math_agent.model_provider}/{module.math_agent.model_name}"
+        self.failed_evals = 0
+        self.num_candidates = num_candidates
+        self.max_demos = max_demos
+        self.dev_size = dev_size
+        self.seed = seed
+        self.program_path = os.path.join(out_dir, "program.json")
+        self.evals_path = os.path.join(out_dir, "evals.jsonl")
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _eval_key(self, cid: str, ex) -> str:
+        """Scores are only reused for the same model, candidate, metric, question and reference answer."""
+        return _digest([self.model_id, cid, self.metric_name, ex.question, ex.answer])
+
+    def _load_evals(self) -> dict[str, float]:
+        evals = {}
+        if os.path.exists(self.evals_path):
+            with open(self.evals_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partial line from an interrupted run
+                    if "key" in r:
+                        evals[r["key"]] = r["score"]
+        return evals
+
+    async def _evaluate_all(self, candidates: dict[str, list], devset: list) -> dict[str, float]:
+        evals = self._load_evals()
+        todo = [(cid, ex) for cid in candidates for ex in devset if self._eval_key(cid, ex) not in evals]
+        print(f"🔁 {len(evals)} cached evaluations, {len(todo)} to run (concurrency {self.module.bridge.max_concurrency})")
+
+        with open(self.evals_path, "a", encoding="utf-8") as log:
+            async def one(cid: str, ex):
+                program = self.module.with_demos(candidates[cid])
+                pred = await self.module.bridge.arun(program.a_forward(ex.question))
+                score = float(self.metric(ex, pred))
+                key = self._eval_key(cid, ex)
+                evals[key] = score
+                if str(getattr(pred, "answer", "")).startswith("Error:"):
+                    self.failed_evals += 1
+                    return  # provider failure, not a real score: retried on the next run
+                log.write(json.dumps({"key": key, "candidate": cid, "metric": self.metric_name,
+                                      "question": ex.question, "score": score}) + "\n")
+                log.flush()
+
+            await asyncio.gather(*(one(cid, ex) for cid, ex in todo))
+        if self.failed_evals:
+            print(f"⚠️  {self.failed_evals} evaluations failed with an error; re-run to retry them")
+
+        return {cid: sum(evals[self._eval_key(cid, ex)] for ex in devset) / len(devset) for cid in candidates}
+
+    def compile(self, examples: list, fresh: bool = False) -> MathTutorModule:
+        settings = {"candidates": self.num_candidates, "max_demos": self.max_demos, "dev_size": self.dev_size, "seed": self.seed,
+                    "metric": self.metric_name, "model": self.model_id}
+        fingerprint = _digest({"examples": [(ex.question, ex.answer) for ex in examples], **settings})
+        if fresh:
+            for path in (self.program_path, self.evals_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        elif os.path.exists(self.program_path):
+            with open(self.program_path, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("fingerprint") == fingerprint:
+                print(f"♻️  Reusing compiled program {self.program_path} (score {saved['score']:.2f})")
+                return load_program(self.program_path, self.module)
+
+        rng = random.Random(self.seed)
+        shuffled = examples[:]
+        rng.shuffle(shuffled)
+        devset = shuffled[:self.dev_size]
+        pool = shuffled[self.dev_size:] or devset
+        k = min(self.max_demos, len(pool))
+        candidates = {"zero-shot": []}
+        for _ in range(self.num_candidates):
+            demos = rng.sample(pool, k)
+            candidates[_digest([(d.question, d.answer) for d in demos])] = demos
+
+        print(f"\n🚀 Evaluating {len(candidates)} candidates on {len(devset)} dev examples...")
+        scores = asyncio.run(self._evaluate_all(candidates, devset))
+        # Highest score wins; fewer demos (shorter prompts) break ties.
+        best = max(candidates, key=lambda cid: (scores[cid], -len(candidates[cid])))
+        with open(self.program_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({
+                # No fingerprint while some scores are provider errors, so the next run re-evaluates.
+                "fingerprint": None if self.failed_evals else fingerprint,
+                "score": scores[best],
+                "demos": [{"question": d.question, "answer": d.answer} for d in candidates[best]],
+                "candidates": [{"id": cid, "score": scores[cid], "demos": len(candidates[cid])} for cid in candidates],
+                **settings,
+            }, f, indent=2)
+        os.replace(self.program_path + ".tmp", self.program_path)
+        print(f"✅ Best candidate {best}: {scores[best]:.2f} (zero-shot {scores['zero-shot']:.2f}) -> {self.program_path}")
+        return self.module.with_demos(candidates[best])
+
+
+def load_program(path: str, module: MathTutorModule) -> MathTutorModule:
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    return module.with_demos([dspy.Example(**d).with_inputs("question") for d in saved["demos"]])
+
 
 class FeedbackAgent:
+    """Collects answers and feedback at the prompt. Feedback is applied the way /feedback does it, and the
+    improved answer becomes the reference: the demo text and what answer_metric checks candidates against."""
     def __init__(self, tutor_module: MathTutorModule):
         self.data_collection_module = tutor_module
         self.examples: list[dspy.Example] = []
+        math_agent = tutor_module.math_agent
+        self.refiner = feedbackAgent(model_provider=math_agent.model_provider, model_name=math_agent.model_name)
 
-    async def ask(self, question: str):
-        prediction = await self.data_collection_module.a_forward(question)
+    def ask(self, question: str):
+        prediction = self.data_collection_module.forward(question)
         ans = getattr(prediction, 'answer', '') or ''
         print(f"\n🤖 Initial Answer: {ans}")
 
         feedback_text = input("🧑‍🎓 Your Feedback: ")
-        ex = dspy.Example(question=question, answer=ans, feedback=feedback_text).with_inputs("question")
+        reference = ans
+        if feedback_text.strip() and not ans.startswith("Error:"):
+            improved = self.refiner.get_feedback_answer(question, ans, feedback_text)
+            if improved and not improved.startswith("Error:"):
+                reference = improved
+                print(f"\n✏️  Improved Answer: {reference}")
+        if reference.startswith("Error:"):
+            print("⚠️  Skipping this question: no usable answer.")
+            return ans
+        ex = dspy.Example(question=question, answer=reference, feedback=feedback_text).with_inputs("question")
         self.examples.append(ex)
         print("✅ Feedback recorded.")
         return ans
 
-    def optimize_with_bootstrap(self):
+    def optimize(self, out_dir: str):
         if not self.examples:
             print("🛑 No examples to optimize.")
             return None
-        print("\n🚀 Optimizing with BootstrapFewShot...")
-        optimizer = BootstrapFewShot(
-            metric=self.simple_metric,
-            max_bootstrapped_demos=4,
-            max_labeled_demos=10,
-            max_rounds=2,
-        )
-        optimized_module = optimizer.compile(self.data_collection_module, trainset=self.examples)
-        print("✅ BootstrapFewShot optimization complete.")
-        return optimized_module
+        optimizer = OfflineOptimizer(self.data_collection_module, out_dir, metric=answer_metric,
+                                     dev_size=max(1, len(self.examples) // 2))
+        return optimizer.compile(self.examples)
 
     @staticmethod
-    def simple_metric(example, pred, trace=None): 
-        if pred is None:
-            return 0.0
-        ans = getattr(pred, 'answer', '')
-        return 1.0 if isinstance(ans, str) and ans.strip() and not ans.startswith("Error:") else 0.0
+    def simple_metric(example, pred, trace=None):
+        return simple_metric(example, pred, trace)
 
 
-async def main():
-    print("--- Phase 1: Data Collection ---")
+def make_module(concurrency: int) -> MathTutorModule:
     math_agent = MathTutorAgent(
-        model_provider="groq",
-        model_name="openai/gpt-oss-120b",  
-        debug=True
+        model_provider=os.getenv("MODEL_PROVIDER", "groq"),
+        model_name=os.getenv("MODEL_NAME", "openai/gpt-oss-120b"),
     )
-    feedback_agent = FeedbackAgent(MathTutorModule(math_agent))
+    return MathTutorModule(math_agent, AsyncBridge(concurrency))
 
-    while True:
-        question = input("\nEnter a math question (or 'optimize'): ")
-        if question.lower() == "optimize":
-            break
-        if not question.strip():
-            continue
-        await feedback_agent.ask(question)
 
-    optimized_tutor = feedback_agent.optimize_with_bootstrap()
+def interactive(args):
+    tutor = make_module(args.concurrency)
+    if args.program:
+        optimized_tutor = load_program(args.program, tutor)
+    else:
+        print("--- Phase 1: Data Collection ---")
+        feedback_agent = FeedbackAgent(tutor)
+        while True:
+            question = input("\nEnter a math question (or 'optimize'): ")
+            if question.lower() == "optimize":
+                break
+            if not question.strip():
+                continue
+            feedback_agent.ask(question)
+        optimized_tutor = feedback_agent.optimize(args.out)
     if optimized_tutor:
         print("\n--- Phase 3: Testing Optimized Tutor ---")
         while True:
@@ -103,5 +299,45 @@ async def main():
             ans = getattr(response, 'answer', '(no answer)')
             print(f"\n🤖 Optimized Answer: {ans}")
 
+
+def offline(args):
+    examples = load_examples(args.logs)
+    if args.max_examples:
+        examples = examples[:args.max_examples]
+    print(f"📥 Loaded {len(examples)} examples from {args.logs}")
+    if len(examples) < 2:
+        print("🛑 Need at least 2 logged examples to optimize.")
+        return
+    optimizer = OfflineOptimizer(make_module(args.concurrency), args.out, num_candidates=args.candidates,
+                                 max_demos=args.max_demos, dev_size=min(args.dev_size, len(examples) // 2), seed=args.seed)
+    optimizer.compile(examples, fresh=args.fresh)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Optimize MathTutorAgent few-shot demos with DSPy")
+    sub = parser.add_subparsers(dest="command")
+    inter = sub.add_parser("interactive", help="Collect feedback at the prompt, then optimize (default)")
+    inter.add_argument('--program', help='Skip collection and load a compiled program.json')
+    opt = sub.add_parser("optimize", help="Optimize offline from /ask and /feedback logs")
+    opt.add_argument('--logs', default=INTERACTION_LOG_DIR)
+    opt.add_argument('--candidates', type=int, default=8, help='Random demo sets to try (plus zero-shot)')
+    opt.add_argument('--max-demos', type=int, default=4)
+    opt.add_argument('--dev-size', type=int, default=20)
+    opt.add_argument('--max-examples', type=int, default=0, help='0 = all')
+    opt.add_argument('--seed', type=int, default=0)
+    opt.add_argument('--fresh', action='store_true', help='Ignore cached evaluations and compiled program')
+    for p in (inter, opt):
+        p.add_argument('--out', default="optimized", help='Checkpoint/cache directory')
+        p.add_argument('--concurrency', type=int, default=4, help='Agent runs in flight')
+    args = parser.parse_args()
+
+    if args.command == "optimize":
+        offline(args)
+    else:
+        if args.command is None:
+            args = inter.parse_args([])
+        interactive(args)
+
+
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,244 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import itertools
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", "4"))
+MAX_QUEUE = int(os.getenv("MAX_QUEUE", "32"))
+QUEUE_DEADLINE_S = float(os.getenv("QUEUE_DEADLINE_S", "90"))
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "600"))
+# /jobs state is shared through this directory so any API worker can answer GET /jobs/{id}.
+JOB_STATE_DIR = os.getenv("JOB_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "jobs"))
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+# Lower value is served first. "benchmark" traffic is scheduled as batch.
+PRIORITIES = {"interactive": 0, "batch": 1, "benchmark": 1}
+
+
+class QueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExpired(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    priority: str
+    work: Callable[[], Awaitable[Any]]
+    deadline: float
+    submitted_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = "queued"  # queued | running | done | failed | expired | cancelled
+    result: Any = None
+    error: Optional[str] = None
+    exception: Optional[BaseException] = None
+    persist: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def summary(self) -> dict:
+        now = time.monotonic()
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "wait_s": ((self.started_at or self.finished_at or now) - self.submitted_at),
+            "run_s": ((self.finished_at or now) - self.started_at) if self.started_at else None,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobScheduler:
+    """Bounded priority queue in front of the agent.
+
+    At most `max_in_flight` jobs run at once; up to `max_queue` wait, interactive before batch.
+    A job still queued past its deadline is expired rather than run, since its caller has
+    most likely given up. Limits are per process (per uvicorn worker); jobs submitted with
+    `persist=True` are also written to `state_dir` on every status change, so `lookup` finds
+    them from any worker.
+    """
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, max_queue: int = MAX_QUEUE, deadline_s: float = QUEUE_DEADLINE_S,
+                 state_dir: str = JOB_STATE_DIR):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.deadline_s = deadline_s
+        self.state_dir = state_dir
+        self._last_state_prune = 0.0
+        self.jobs: dict[str, Job] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers: list[asyncio.Task] = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        # Live queued jobs; _queue may also hold cancelled entries that workers skip when they reach them.
+        self._queued = 0
+        self._waits: deque[float] = deque(maxlen=1000)
+        self._runs: deque[float] = deque(maxlen=1000)
+        self.counters = {"submitted": 0, "rejected": 0, "expired": 0, "done": 0, "failed": 0, "cancelled": 0}
+
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.PriorityQueue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_in_flight)]
+
+    def retry_after(self) -> int:
+        """Rough seconds until a queue slot frees up, from recent run times."""
+        avg_run = sum(self._runs) / len(self._runs) if self._runs else 10.0
+        return max(1, int(avg_run * (self._queued + 1) / self.max_in_flight))
+
+    def submit(self, work: Callable[[], Awaitable[Any]], priority: str = "interactive", deadline_s: Optional[float] = None,
+               persist: bool = False) -> Job:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        self._ensure_started()
+        self._prune()
+        if self._queued >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise QueueFull(self.retry_after())
+        job = Job(id=uuid.uuid4().hex, priority=priority, work=work,
+                  deadline=time.monotonic() + (deadline_s if deadline_s is not None else self.deadline_s), persist=persist)
+        self.jobs[job.id] = job
+        self._save(job)
+        self.counters["submitted"] += 1
+        self._queued += 1
+        self._queue.put_nowait((PRIORITIES[priority], next(self._seq), job))
+        return job
+
+    async def run(self, work: Callable[[], Awaitable[Any]], priority: str = "interactive", deadline_s: Optional[float] = None) -> Any:
+        """Submit and wait; raises QueueFull / DeadlineExpired, or re-raises the job's exception."""
+        job = self.submit(work, priority, deadline_s)
+        try:
+            await job.done.wait()
+        except asyncio.CancelledError:
+            # Caller went away (e.g. client disconnect): don't spend a slot on it later.
+            if job.status == "queued":
+                job.status, job.finished_at, job.error = "cancelled", time.monotonic(), "Cancelled while queued"
+                self._queued -= 1
+                self.counters["cancelled"] += 1
+                self._save(job)
+            raise
+        finally:
+            self.jobs.pop(job.id, None)
+        if job.status == "done":
+            return job.result
+        if job.status == "expired":
+            raise DeadlineExpired(job.error)
+        if isinstance(job.exception, Exception) and not isinstance(job.exception, asyncio.CancelledError):
+            raise job.exception
+        raise RuntimeError(job.error or f"Job {job.status}")
+
+    async def _worker(self):
+        while True:
+            _, _, job = await self._queue.get()
+            if job.status == "cancelled":
+                continue
+            self._queued -= 1
+            now = time.monotonic()
+            if now > job.deadline:
+                job.status, job.finished_at = "expired", now
+                job.error = f"Expired after {now - job.submitted_at:.1f}s in queue"
+                self.counters["expired"] += 1
+                self._save(job)
+                job.done.set()
+                continue
+            job.status, job.started_at = "running", now
+            self._save(job)
+            self._waits.append(now - job.submitted_at)
+            self._in_flight += 1
+            try:
+                job.result = await job.work()
+                job.status = "done"
+            except asyncio.CancelledError as e:
+                job.status, job.error, job.exception = "cancelled", "Cancelled while running", e
+                if asyncio.current_task().cancelling():
+                    raise  # the worker itself is being shut down
+            except BaseException as e:
+                # Anything the job raises is the job's failure; the worker keeps serving the queue.
+                job.status, job.error, job.exception = "failed", str(e) or type(e).__name__, e
+            finally:
+                self._in_flight -= 1
+                job.finished_at = time.monotonic()
+                self._runs.append(job.finished_at - job.started_at)
+                if job.status in self.counters:
+                    self.counters[job.status] += 1
+                self._save(job)
+                job.done.set()
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_TTL_S
+        for job_id in [j.id for j in self.jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self.jobs[job_id]
+        now = time.time()
+        if now - self._last_state_prune < 60 or not os.path.isdir(self.state_dir):
+            return
+        self._last_state_prune = now
+        for name in os.listdir(self.state_dir):
+            path = os.path.join(self.state_dir, name)
+            try:
+                if os.path.getmtime(path) < now - JOB_TTL_S:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _save(self, job: Job):
+        """Write the job's summary with a temp file + os.replace, so readers in other workers
+        see either the previous state or the new one, never a partial file."""
+        if not job.persist:
+            return
+        path = self._state_path(job.id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(job.summary(), f, ensure_ascii=False, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[JobScheduler] Failed to save job {job.id}: {e}")
+
+    def lookup(self, job_id: str) -> Optional[dict]:
+        """Summary of a job from this worker, or from the shared state dir if another worker owns it.
+        For a job owned elsewhere, wait_s/run_s are as of its last status change."""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.summary()
+        if not _JOB_ID.fullmatch(job_id):
+            return None
+        path = self._state_path(job_id)
+        try:
+            if os.path.getmtime(path) < time.time() - JOB_TTL_S:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def metrics(self) -> dict:
+        waits = sorted(self._waits)
+        depth = {name: 0 for name in ("interactive", "batch")}
+        for j in self.jobs.values():
+            if j.status == "queued":
+                depth["interactive" if PRIORITIES[j.priority] == 0 else "batch"] += 1
+        return {
+            "in_flight": self._in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": self._queued,
+            "queue_depth_by_priority": depth,
+            "max_queue": self.max_queue,
+            "wait_s_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_s_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            **self.counters,
+        }
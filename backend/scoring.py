@@ -0,0 +1,233 @@
+import os
+import re
+import sys
+import json
+import argparse
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Optional
+
+# Compiled once at import; extract_option used to rebuild most of these per answer.
+_LATEX_DELIMS = re.compile(r'\$|\\\(|\\\)|\\\[|\\\]')
+_LATEX_CMD_ARG = re.compile(r'\\[a-zA-Z]+\{[^}]*\}')
+_LATEX_CMD = re.compile(r'\\[a-zA-Z]+')
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+_EXPLICIT_OPTION = re.compile(r'\b(?:option|choice|ans|answer)\s*[:\-]?\s*\(?([1-4])\)?\b', re.IGNORECASE)
+_PAREN_OPTION = re.compile(r'\(\s*([1-4])\s*\)')
+_CONCLUSION_WORD = re.compile(r'(final|answer|hence|therefore|so|thus)', re.I)
+_STEP_WORD = re.compile(r'\b(step|step:)\b', re.I)
+_CHOICE_PAREN = re.compile(r'\(\s*([1-4])\s*\)\s*([^\n\r]*)')
+_CHOICE_BARE = re.compile(r'([1-4])\)\s*([^\n\r]*)')
+_FINAL_NUMBER = re.compile(r'(?:final answer|final|final:|answer:|ans:|hence|therefore|so|thus)[^\d\n\r\-]{0,40}(-?\d+(?:\.\d+)?)', re.I)
+# Numeric answers: word-bounded, explicit answer markers ranked above bare conclusion words.
+_EXPLICIT_NUMBER = re.compile(r'\b(?:final\s+answer|final|answer|ans)\b[^\d\n\r\-]{0,40}(-?\d+(?:\.\d+)?)', re.I)
+_CONCLUSION_NUMBER = re.compile(r'\b(?:hence|therefore|thus|so)\b[^\d\n\r\-]{0,40}(-?\d+(?:\.\d+)?)', re.I)
+_GSM8K_GOLD = re.compile(r'####\s*(-?[\d,]*\.?\d+)')
+_GOLD_OPTION = re.compile(r'^\(?\s*([1-4A-Da-d])\s*\)?\.?$')
+
+
+def _normalize_choice_text(s: str) -> str:
+    """Return a normalized representation for a choice's text to match against model output.
+    Prefer numeric extraction (e.g. '784' from '$784$', '784\\,' etc.),
+    otherwise return cleaned lowercased text."""
+    if s is None:
+        return ""
+
+    s = _LATEX_DELIMS.sub('', s)
+    s = _LATEX_CMD_ARG.sub('', s)
+    s = _LATEX_CMD.sub('', s)
+    s = s.replace(',', '')
+    s = s.strip()
+
+    m = _NUMBER.search(s)
+    if m:
+        return m.group(0)
+    return s.lower()
+
+
+@lru_cache(maxsize=4096)
+def _choices(question: str) -> tuple:
+    """(option, normalized value, word-bounded pattern or None) per choice; parsed once per question."""
+    choices = {}
+    for m in _CHOICE_PAREN.finditer(question):
+        choices[m.group(1)] = m.group(2).strip()
+    if not choices:
+        for m in _CHOICE_BARE.finditer(question):
+            choices[m.group(1)] = m.group(2).strip()
+    out = []
+    for opt, val in choices.items():
+        norm = _normalize_choice_text(val)
+        if norm:
+            numeric = _NUMBER.fullmatch(norm) is not None
+            out.append((opt, norm, re.compile(rf'\b{re.escape(norm)}\b') if numeric else None))
+    return tuple(out)
+
+
+def extract_option(text: str, question: str) -> str:
+    """Robustly extract MCQ option 1..4 from model output `text` using `question` options as fallback.
+    Returns '1'|'2'|'3'|'4' or 'None'."""
+    if not text:
+        return "None"
+    m = _EXPLICIT_OPTION.search(text)
+    if m:
+        return m.group(1)
+    parentheses_matches = list(_PAREN_OPTION.finditer(text))
+    if parentheses_matches:
+        for pm in parentheses_matches:
+            start_idx = pm.start()
+            if _CONCLUSION_WORD.search(text, max(0, start_idx - 100), start_idx):
+                return pm.group(1)
+        last_pm = parentheses_matches[-1]
+        if not _STEP_WORD.search(text[last_pm.end():last_pm.end()+20]):
+            return last_pm.group(1)
+    choices = _choices(question)
+    text_lower = text.lower()
+    for opt, norm_val, pattern in choices:
+        if pattern is not None:
+            if pattern.search(text):
+                return opt
+        elif norm_val.lower() in text_lower:
+            return opt
+    m = _FINAL_NUMBER.search(text)
+    if m:
+        final_num = m.group(1)
+        for opt, norm_val, _ in choices:
+            if norm_val == final_num:
+                return opt
+        if final_num in {"1", "2", "3", "4"}:
+            return final_num
+    # Numeric choices can't match here (the loop above would have returned); only a
+    # case-insensitive regex hit on a text choice that str.lower() missed is left.
+    last_pos = -1
+    last_opt = None
+    for opt, norm_val, pattern in choices:
+        if pattern is None:
+            for m in re.finditer(re.escape(norm_val), text, flags=re.I):
+                if m.end() > last_pos:
+                    last_pos = m.end()
+                    last_opt = opt
+    if last_opt:
+        return last_opt
+
+    return "None"
+
+
+def normalize_gold_option(gold) -> str:
+    """'2', '(2)', 'B' and 'b.' all become '2'; anything else is returned stripped and uppercased."""
+    g = str(gold).strip()
+    m = _GOLD_OPTION.match(g)
+    if not m:
+        return g.upper()
+    c = m.group(1).upper()
+    return str("ABCD".index(c) + 1) if c in "ABCD" else c
+
+
+def _to_number(s: str) -> Optional[float]:
+    try:
+        return float(s.replace(",", "").rstrip("."))
+    except (ValueError, AttributeError):
+        return None
+
+
+def extract_number(text: str) -> Optional[float]:
+    """Final numeric answer from model output: a GSM8K '####' marker, else the number after the last
+    explicit marker ('final answer', 'answer:', ...), else after the last conclusion word ('therefore',
+    'so', ...), else the last number in the text."""
+    if not text:
+        return None
+    text = text.replace(",", "")
+    m = _GSM8K_GOLD.search(text)
+    if m:
+        return _to_number(m.group(1))
+    for pattern in (_EXPLICIT_NUMBER, _CONCLUSION_NUMBER):
+        last = None
+        for last in pattern.finditer(text):
+            pass
+        if last:
+            return _to_number(last.group(1))
+    nums = _NUMBER.findall(text)
+    return _to_number(nums[-1]) if nums else None
+
+
+def gold_number(gold) -> Optional[float]:
+    m = _GSM8K_GOLD.search(str(gold))
+    return _to_number(m.group(1) if m else str(gold).strip())
+
+
+def score_record(record: dict, kind: str = "auto", output_field: str = "raw",
+                 question_field: str = "question", gold_field: str = "gold") -> dict:
+    """Score one saved model output. `kind` is "mcq", "numeric" or "auto" (MCQ when the gold is an option 1-4/A-D
+    and the question lists choices)."""
+    raw = record.get(output_field) or ""
+    question = record.get(question_field) or ""
+    gold = record.get(gold_field)
+    if kind == "auto":
+        kind = "mcq" if _GOLD_OPTION.match(str(gold).strip()) and _choices(question) else "numeric"
+    if kind == "mcq":
+        gold_opt = normalize_gold_option(gold)
+        pred = extract_option(raw, question)
+        return {"kind": kind, "pred": pred, "gold": gold_opt, "correct": pred == gold_opt}
+    expected, pred = gold_number(gold), extract_number(raw)
+    correct = expected is not None and pred is not None and abs(pred - expected) <= 1e-6 * max(1.0, abs(expected))
+    return {"kind": kind, "pred": pred, "gold": expected, "correct": correct}
+
+
+def _score_line(args):
+    """Scored record, None for a blank line, or False for a line that isn't a JSON object."""
+    line, options = args
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except json.JSONDecodeError:
+        return False
+    if not isinstance(record, dict):
+        return False
+    return {**record, **score_record(record, **options)}
+
+
+def score_file(path: str, options: dict, workers: int, out_path: Optional[str] = None) -> dict:
+    correct, total, bad = 0, 0, 0
+    out = open(out_path, "w", encoding="utf-8") if out_path else None
+    try:
+        with open(path, "r", encoding="utf-8") as f, Pool(workers) as pool:
+            for result in pool.imap(_score_line, ((line, options) for line in f), chunksize=256):
+                if result is None:
+                    continue
+                if result is False:
+                    bad += 1
+                    continue
+                total += 1
+                correct += result["correct"]
+                if out:
+                    out.write(json.dumps(result, ensure_ascii=False) + "\n")
+    finally:
+        if out:
+            out.close()
+    return {"total": total, "correct": correct, "accuracy": correct / total if total else 0.0, "skipped": bad}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score saved model outputs (JSONL) for MCQ or GSM8K-style numeric datasets")
+    parser.add_argument('inputs', nargs='+', help='JSONL files, e.g. written by benchmark.py --save')
+    parser.add_argument('--kind', choices=["auto", "mcq", "numeric"], default="auto")
+    parser.add_argument('--output-field', default="raw")
+    parser.add_argument('--question-field', default="question")
+    parser.add_argument('--gold-field', default="gold")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--out', help='Write per-record scores here (single input only)')
+    args = parser.parse_args()
+    if args.out and len(args.inputs) > 1:
+        sys.exit("--out takes a single input file")
+
+    options = {"kind": args.kind, "output_field": args.output_field,
+               "question_field": args.question_field, "gold_field": args.gold_field}
+    for path in args.inputs:
+        r = score_file(path, options, args.workers, args.out)
+        skipped = f" ({r['skipped']} unreadable lines skipped)" if r["skipped"] else ""
+        print(f"📊 {path}: {r['correct']}/{r['total']} = {r['accuracy']:.2%}{skipped}")
+
+
+if __name__ == '__main__':
+    main()
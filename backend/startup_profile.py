@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile_import(module: str, env: dict) -> tuple[float, float, list[tuple[str, int]], str]:
+    """Import `module` in a fresh interpreter with -X importtime. Returns wall seconds, seconds spent
+    importing `module`, its direct imports as (top-level package, cumulative us), and stderr on failure."""
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=HERE, env=env)
+    wall = time.perf_counter() - t0
+    # importtime prints children before their parent, indented two spaces per level.
+    pending: dict[int, list[tuple[str, int]]] = defaultdict(list)
+    direct, total_us, errors = [], 0, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            errors.append(line)
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # header line
+        name = parts[2][1:]
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        name = name.strip()
+        children = pending.pop(depth + 1, [])
+        if depth == 0 and name == module:
+            direct, total_us = children, int(parts[1])
+        pending[depth].append((name, int(parts[1])))
+    packages: dict[str, int] = defaultdict(int)
+    for name, us in direct:
+        packages[name.split(".")[0]] += us
+    failure = "\n".join(errors[-5:]) if proc.returncode != 0 else ""
+    return wall, total_us / 1e6, sorted(packages.items(), key=lambda kv: -kv[1]), failure
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time profile of the server entry modules")
+    parser.add_argument('modules', nargs='*', default=["api_server", "mcp_server", "KB_setup", "vdb_updater", "agent"])
+    parser.add_argument('--top', type=int, default=10, help='Heaviest top-level packages to list per module')
+    args = parser.parse_args()
+
+    env = dict(os.environ, FAST_START="1")
+    for module in args.modules:
+        wall, total, packages, failure = profile_import(module, env)
+        print(f"\n⏱️  import {module}: {wall:.2f}s wall, {total:.2f}s in imports")
+        if failure:
+            print(f"   ⚠️  import failed:\n{failure}")
+        for name, us in packages[:args.top]:
+            print(f"   {us / 1e6:8.3f}s  {name}")
+
+
+if __name__ == '__main__':
+    main()
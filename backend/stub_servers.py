@@ -0,0 +1,116 @@
+"""Local stand-ins for the LLM provider and the MCP tool server, for load testing without provider quota.
+
+    python stub_servers.py llm --port 9101 --latency-ms 800 --tools retrieve_data
+    python stub_servers.py mcp --port 9102 --latency-ms 20
+"""
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from collections import Counter
+
+
+def create_llm_app(latency_ms: float, jitter_ms: float, tools: list[str]):
+    """OpenAI-compatible /v1/chat/completions. Each conversation calls `tools` in order
+    (one per model turn, skipping any the client didn't offer), then returns a final answer."""
+    from fastapi import FastAPI, Request
+
+    app = FastAPI(title="Stub LLM")
+    stats = Counter()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, random.gauss(latency_ms, jitter_ms)) / 1000)
+
+        messages = body.get("messages", [])
+        question = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        offered = {t.get("function", {}).get("name") for t in body.get("tools", [])}
+        turn = sum(1 for m in messages if m.get("role") == "tool")
+        script = [name for name in tools if name in offered]
+
+        if turn < len(script):
+            stats["tool_calls"] += 1
+            message = {"role": "assistant", "content": None, "tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": script[turn], "arguments": json.dumps({"query": question[:200]})},
+            }]}
+            finish_reason = "tool_calls"
+        else:
+            message = {"role": "assistant", "content": "Step 1: Retrieved context.\nStep 2: Solve.\nFinal: x^2 = 4, so x = 2"}
+            finish_reason = "stop"
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return app
+
+
+def create_mcp_server(latency_ms: float):
+    """Same tool names and signatures as mcp_server.py, with canned results."""
+    from fastmcp import FastMCP
+
+    mcp = FastMCP("StubServer")
+    doc = "Q: Solve x^2 = 4 for positive x.\nA: x = 2\n"
+
+    @mcp.tool
+    async def retrieve_data(query: str) -> str:
+        """Retrieve relevant data from the knowledge base."""
+        await asyncio.sleep(latency_ms / 1000)
+        return doc * 3
+
+    @mcp.tool
+    async def retrieve_data_batch(queries: list[str]) -> str:
+        """Retrieve knowledge-base data for several queries at once. Returns a JSON list with one text per query."""
+        await asyncio.sleep(latency_ms / 1000)
+        return json.dumps([doc * 3 for _ in queries])
+
+    @mcp.tool
+    async def web_search(query: str) -> str:
+        """Perform a web search to gather information."""
+        await asyncio.sleep(latency_ms / 1000)
+        return "Stub web result."
+
+    return mcp
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub LLM / MCP servers for load testing")
+    sub = parser.add_subparsers(dest="kind", required=True)
+    llm = sub.add_parser("llm")
+    llm.add_argument('--port', type=int, default=9101)
+    llm.add_argument('--latency-ms', type=float, default=800)
+    llm.add_argument('--jitter-ms', type=float, default=200)
+    llm.add_argument('--tools', default="retrieve_data", help='Comma-separated tool calls to script before answering')
+    mcp = sub.add_parser("mcp")
+    mcp.add_argument('--port', type=int, default=9102)
+    mcp.add_argument('--latency-ms', type=float, default=20)
+    args = parser.parse_args()
+
+    if args.kind == "llm":
+        import uvicorn
+        tools = [t.strip() for t in args.tools.split(",") if t.strip()]
+        uvicorn.run(create_llm_app(args.latency_ms, args.jitter_ms, tools), host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        create_mcp_server(args.latency_ms).run(transport="http", host="127.0.0.1", port=args.port, path="/mcp")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,119 @@
 import os
+import time
+import shutil
 import threading
-from typing import Optional
-from langchain_community.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
+from typing import Optional, TYPE_CHECKING
+from embedding_cache import get_embeddings
+from file_lock import file_lock
 
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+VECTOR_DB_ROOT = os.getenv("VECTOR_DB_ROOT", "/home/egg/Documents/agentic_rag_MT/vector_db")
+
+# Guards the in-process store object; the flock below guards the files across uvicorn workers.
 _LOCK = threading.Lock()
+# Each save goes to its own `v-*` directory; CURRENT names the live one and is swapped with a
+# single os.replace, so readers see either the old faiss+pkl pair or the new one, never a mix.
+_CURRENT = "CURRENT"
+_KEEP_VERSIONS = 2
+
+
+def _lock_path(vector_store_dir: str) -> str:
+    return vector_store_dir.rstrip(os.sep) + ".lock"
+
+
+def _index_version(vector_store_dir: str) -> Optional[str]:
+    """Name of the live version directory, "." for a pre-versioning flat layout, None if no index."""
+    try:
+        with open(os.path.join(vector_store_dir, _CURRENT), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return "." if os.path.exists(os.path.join(vector_store_dir, "index.faiss")) else None
+
+
+def vector_store_exists(vector_store_dir: str) -> bool:
+    return _index_version(vector_store_dir) is not None
+
+
+def _load(vector_store_dir: str, version: str, embeddings) -> "FAISS":
+    from langchain_community.vectorstores import FAISS
+    return FAISS.load_local(os.path.join(vector_store_dir, version), embeddings, allow_dangerous_deserialization=True)
+
+
+def load_vector_store(vector_store_dir: str, embeddings) -> "FAISS":
+    """Load the live version under a shared lock, so a concurrent save can't prune it mid-read."""
+    with file_lock(_lock_path(vector_store_dir), shared=True):
+        version = _index_version(vector_store_dir)
+        if version is None:
+            raise RuntimeError(f"Vector store not found: {vector_store_dir}")
+        return _load(vector_store_dir, version, embeddings)
+
+
+def save_vector_store(vector_store: "FAISS", vector_store_dir: str) -> str:
+    """Write a new version directory, then atomically point CURRENT at it and prune old versions.
+    Caller must hold the exclusive lock (see `locked`). Returns the new version name."""
+    os.makedirs(vector_store_dir, exist_ok=True)
+    version = f"v-{time.time_ns()}-{os.getpid()}"
+    vector_store.save_local(os.path.join(vector_store_dir, version))
+    tmp = os.path.join(vector_store_dir, f"{_CURRENT}.tmp-{os.getpid()}")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(vector_store_dir, _CURRENT))
+    versions = sorted(d for d in os.listdir(vector_store_dir) if d.startswith("v-"))
+    for old in versions[:-_KEEP_VERSIONS]:
+        if old != version:
+            shutil.rmtree(os.path.join(vector_store_dir, old), ignore_errors=True)
+    return version
+
+
+def locked(vector_store_dir: str):
+    return file_lock(_lock_path(vector_store_dir))
+
 
 class VectorDBUpdater:
-    def __init__(self, vector_db_root: str = "/home/egg/Documents/agentic_rag_MT/vector_db"):
+    def __init__(self, vector_db_root: str = VECTOR_DB_ROOT):
         self.vector_db_root = vector_db_root
         self.vector_store_dir = os.path.join(vector_db_root, "vector_store")
-        self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        self._vector_store: Optional[FAISS] = None
+        self.embeddings = get_embeddings()
+        self._vector_store: Optional["FAISS"] = None
+        self._version = None
 
     def _ensure_loaded(self):
-        if self._vector_store is None:
-            if not os.path.isdir(self.vector_store_dir):
+        """Called with the exclusive lock held; reloads if another worker saved since we last did."""
+        version = _index_version(self.vector_store_dir)
+        if self._vector_store is None or version != self._version:
+            if version is None:
                 raise RuntimeError(f"Vector store dir not found: {self.vector_store_dir}")
-            self._vector_store = FAISS.load_local(self.vector_store_dir, self.embeddings, allow_dangerous_deserialization=True)
+            self._vector_store = _load(self.vector_store_dir, version, self.embeddings)
+            self._version = version
 
     def add_qa_pair(self, question: str, answer: str) -> bool:
         """Add a new Q/A pair as a text block and persist FAISS index.
+        Safe to call from several worker processes sharing one vector_db_root.
         Returns True if success else False.
         """
-        text = f"Q: {question}\nA: {answer}".strip()
-        if not text:
+        return self.add_qa_pairs([(question, answer)])
+
+    def add_qa_pairs(self, pairs: list[tuple[str, str]]) -> bool:
+        """Add several Q/A pairs with a single embed call and a single save."""
+        texts = [f"Q: {question}\nA: {answer}".strip() for question, answer in pairs]
+        texts = [t for t in texts if t]
+        if not texts:
             return False
-        with _LOCK:
-            self._ensure_loaded()
+        with _LOCK, locked(self.vector_store_dir):
             try:
-                self._vector_store.add_texts([text])
+                self._ensure_loaded()
+                self._vector_store.add_texts(texts)
                 # Persist updated index
-                self._vector_store.save_local(self.vector_store_dir)
+                self._version = save_vector_store(self._vector_store, self.vector_store_dir)
                 return True
             except Exception as e:
-                print(f"[VectorDBUpdater] Failed to add pair: {e}")
+                # Drop the in-memory copy so the next call starts from what is on disk.
+                self._vector_store = None
+                print(f"[VectorDBUpdater] Failed to add pairs: {e}")
                 return False
 
 # Singleton style convenience
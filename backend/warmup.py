@@ -0,0 +1,73 @@
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Callable
+
+FAST_START = os.getenv("FAST_START", "1").lower() not in ("0", "false", "no")
+
+
+class Component:
+    def __init__(self, name: str, loader: Callable[[], Any]):
+        self.name = name
+        self.loader = loader
+        self.status = "pending"  # pending | loading | ready | failed
+        self.value: Any = None
+        self.error: str | None = None
+        self.seconds: float | None = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        """Load on first call; concurrent callers wait for the same load. A failed load is retried."""
+        with self._lock:
+            if self.status != "ready":
+                self.status = "loading"
+                t0 = time.perf_counter()
+                try:
+                    self.value = self.loader()
+                    self.status, self.error = "ready", None
+                except Exception as e:
+                    self.status, self.error = "failed", str(e)
+                    raise
+                finally:
+                    self.seconds = time.perf_counter() - t0
+            return self.value
+
+
+class Warmup:
+    """Named heavy components (agents, embedding model) that load on first use, or all at once in a
+    background thread via `start()` so the server can accept connections and report readiness meanwhile."""
+    def __init__(self):
+        self.components: dict[str, Component] = {}
+        self._thread: threading.Thread | None = None
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        self.components[name] = Component(name, loader)
+
+    def get(self, name: str) -> Any:
+        return self.components[name].get()
+
+    async def aget(self, name: str) -> Any:
+        component = self.components[name]
+        if component.status == "ready":
+            return component.value
+        return await asyncio.to_thread(component.get)
+
+    def _load_all(self):
+        for component in self.components.values():
+            try:
+                component.get()
+            except Exception as e:
+                print(f"[Warmup] {component.name} failed to load: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._load_all, name="warmup", daemon=True)
+            self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        return all(c.status == "ready" for c in self.components.values())
+
+    def status(self) -> dict:
+        return {name: {"status": c.status, "seconds": c.seconds, "error": c.error} for name, c in self.components.items()}
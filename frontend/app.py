@@ -186,6 +186,8 @@ if send and prompt.strip():
             if resp.status_code == 200:
                 data = resp.json()
                 answer = data.get("answer") or data.get("error") or "(no response)"
+            elif resp.status_code == 429:
+                answer = f"MathMentor is busy right now, please try again in {resp.headers.get('Retry-After', 'a few')} seconds."
             else:
                 answer = f"Error {resp.status_code}: {resp.text}"
         except Exception as e: